@@ -12,12 +12,24 @@ Novidades:
 """
 
 import sqlite3
+import bisect
 import csv
 import os
 import datetime
+import heapq
+import json
+import math
+import queue
 import re
+import threading
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import escape as xml_escape
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 
 DB_FILE = "contacts.db"
 
@@ -36,11 +48,23 @@ COLUMNS = [
     ("notes", "Observações"),
 ]
 
+# Larguras (px) das colunas na tabela; também usadas na exportação .xlsx
+COLUMN_WIDTHS = {
+    "id": 60, "name": 220, "phone": 130, "email": 220, "course": 160,
+    "visit_date": 130, "status": 160, "monthly_fee": 140,
+    "how_found": 190, "course_for": 150, "attended_by": 150, "notes": 800
+}
+
 DATE_FMT = "%d/%m/%Y"  # DD/MM/AAAA
 
 # Lista padronizada de cursos para formulário e filtros
 COURSES = ["Inglês", "Espanhol", "Informática", "Profissionalizante", "Robótica"]
 
+STATUSES = ["Novo", "Em contato", "Retornar ligação", "Fechou matrícula", "Sem interesse"]
+
+# Máximo de ids por "WHERE id IN (...)" (limite de parâmetros do SQLite é 999 em versões antigas)
+BULK_CHUNK = 500
+
 # Altura padrão da caixa de Observações
 NOTES_DEFAULT_HEIGHT = 8
 
@@ -74,12 +98,142 @@ def format_br_phone_from_digits(s: str) -> str | None:
         return f"{d[0:4]}-{d[4:]}"
     return None
 
-
-def init_db():
-    con = sqlite3.connect(DB_FILE)
-    cur = con.cursor()
-    # tabela base
-    cur.execute(
+def normalize_search(s: str) -> str:
+    """Chave de busca: sem acentos, casefold e só letras/dígitos separados por espaço.
+    Ex.: "  ÉRICA  da Conceição" -> "erica da conceicao"."""
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch)).casefold()
+    s = re.sub(r"['’]", "", s)  # D'Ávila -> davila
+    return " ".join(re.findall(r"[^\W_]+", s))
+
+def sort_key(col: str, value):
+    """Chave de ordenação de um valor da coluna `col` (tabela e busca em várias unidades)."""
+    if col == "visit_date":
+        try:
+            return datetime.datetime.strptime(value, DATE_FMT).date() if value else datetime.date.min
+        except Exception:
+            return datetime.date.min
+    if col == "monthly_fee":
+        try:
+            return float(str(value or "").replace(".", "").replace(",", "."))
+        except ValueError:
+            return 0.0
+    if col == "id":
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+    return str(value or "").lower()
+
+def _prefix_range(prefix: str) -> tuple[str, str]:
+    """Limites [prefix, fim) para buscar por prefixo com '>= AND <' (usa o índice)."""
+    return prefix, prefix + "\U0010ffff"
+
+
+# --------------------- Detecção de alterações ---------------------
+CHANGE_POLL_MS = 1000         # intervalo de checagem de PRAGMA data_version
+CHANGE_JOURNAL_KEEP = 10000   # entradas mantidas em contacts_changes
+
+# --------------------- Autocompletar ---------------------
+AUTOCOMPLETE_LIMIT = 8
+
+class PrefixIndex:
+    """Índice de prefixos em memória para autocompletar (lista ordenada + bisect).
+
+    Guarda pares (chave normalizada, valor) ordenados e quantos contatos usam
+    cada valor; cada sugestão é uma busca binária, sem SQL por tecla. Com
+    word_starts=True, as chaves são as palavras do valor e cada palavra digitada
+    precisa ser início de alguma delas, como na busca por nome ("jose sil" acha
+    "José da Silva").
+    """
+
+    def __init__(self, word_starts=False):
+        self.word_starts = word_starts
+        self._keys = []    # [(chave, valor)] em ordem
+        self._counts = {}  # valor -> nº de contatos
+        self._cache = {}   # (palavras digitadas, limite) -> sugestões; prefixo curto casa com muita coisa
+
+    def _keys_for(self, value):
+        words = normalize_search(value).split()
+        if not words:
+            return []
+        if not self.word_starts:
+            return [" ".join(words)]
+        return sorted(set(words))
+
+    def load(self, pairs):
+        """Carga inicial a partir de (valor, contagem), ordenando uma única vez."""
+        self._counts = {v: n for v, n in pairs if v}
+        self._keys = sorted((k, v) for v in self._counts for k in self._keys_for(v))
+        self._cache.clear()
+
+    def _scan_key(self, words):
+        # a faixa do bisect sai da palavra digitada mais longa (menos candidatos);
+        # as demais são conferidas nas palavras de cada candidato
+        return max(words, key=len) if self.word_starts else " ".join(words)
+
+    def _invalidate(self, value):
+        """Descarta só as sugestões em cache que podem conter `value`."""
+        keys = self._keys_for(value)
+        for entry in [e for e in self._cache if any(k.startswith(self._scan_key(e[0])) for k in keys)]:
+            del self._cache[entry]
+
+    def add(self, value, n=1):
+        if not value:
+            return
+        count = self._counts.get(value, 0)
+        self._counts[value] = count + n
+        self._invalidate(value)
+        if count == 0:
+            for k in self._keys_for(value):
+                bisect.insort(self._keys, (k, value))
+
+    def remove(self, value, n=1):
+        count = self._counts.get(value, 0)
+        if not count:
+            return
+        self._invalidate(value)
+        if count > n:
+            self._counts[value] = count - n
+            return
+        del self._counts[value]
+        for k in self._keys_for(value):
+            i = bisect.bisect_left(self._keys, (k, value))
+            if i < len(self._keys) and self._keys[i] == (k, value):
+                del self._keys[i]
+
+    def suggest(self, text, limit=AUTOCOMPLETE_LIMIT):
+        """Valores que casam com `text` (início do valor ou, com word_starts, início
+        de palavra para cada palavra digitada); os mais usados primeiro, entre todos."""
+        words = tuple(normalize_search(text).split())
+        if not words:
+            return []
+        cached = self._cache.get((words, limit))
+        if cached is not None:
+            return list(cached)
+        scan = self._scan_key(words)
+        i = bisect.bisect_left(self._keys, (scan,))
+        j = bisect.bisect_left(self._keys, (scan + "\U0010ffff",), i)
+        found = {v for _, v in self._keys[i:j]}
+        if self.word_starts and len(words) > 1:
+            found = [v for v in found
+                     if all(any(w.startswith(t) for w in self._keys_for(v)) for t in words)]
+        # empates seguem a ordem alfabética
+        result = heapq.nsmallest(limit, found, key=lambda v: (-self._counts[v], v.casefold()))
+        if len(self._cache) >= 256:
+            self._cache.clear()
+        self._cache[(words, limit)] = result
+        return list(result)
+
+
+# --------------------- Schema / migrações ---------------------
+# Data da visita (DD/MM/AAAA) convertida para AAAA-MM-DD. Usada nos filtros e no
+# índice de expressão: precisa ser exatamente a mesma expressão nos dois lugares.
+VISIT_ISO_EXPR = "(substr(visit_date,7,4)||'-'||substr(visit_date,4,2)||'-'||substr(visit_date,1,2))"
+
+def _migration_base_schema(con):
+    """v1: tabela base + colunas adicionadas nas versões anteriores do app."""
+    con.execute(
         """
         CREATE TABLE IF NOT EXISTS contacts (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -94,21 +248,714 @@ def init_db():
         )
         """
     )
-    con.commit()
+    cols = {row[1] for row in con.execute("PRAGMA table_info(contacts)")}
+    for col in ["monthly_fee", "how_found", "course_for", "attended_by"]:
+        if col not in cols:
+            con.execute(f"ALTER TABLE contacts ADD COLUMN {col} TEXT")
+
+def _migration_filter_indexes(con):
+    """v2: índices dos filtros. Todo índice termina no rowid (= id), então
+    'WHERE status = ? ORDER BY id DESC' sai do índice já ordenado, sem sort."""
+    con.execute("CREATE INDEX IF NOT EXISTS idx_contacts_attended_by ON contacts(attended_by)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_contacts_status ON contacts(status)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_contacts_course ON contacts(course)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS idx_contacts_visit_iso ON contacts({VISIT_ISO_EXPR})")
+
+def index_contact_name(con, contact_id, name):
+    """Atualiza name_search e os tokens de nome de um contato (mesma transação do INSERT/UPDATE)."""
+    key = normalize_search(name)
+    con.execute("UPDATE contacts SET name_search = ? WHERE id = ?", (key, contact_id))
+    con.execute("DELETE FROM name_tokens WHERE contact_id = ?", (contact_id,))
+    con.executemany(
+        "INSERT OR IGNORE INTO name_tokens (token, contact_id) VALUES (?, ?)",
+        [(tok, contact_id) for tok in set(key.split())],
+    )
 
-    # garantir novas colunas
-    cur.execute("PRAGMA table_info(contacts)")
-    cols = {row[1] for row in cur.fetchall()}
+def index_missing_names(con) -> int:
+    """Indexa contatos sem name_search: inseridos ou renomeados por outra
+    ferramenta (o trigger da v6 zera name_search quando o nome muda)."""
+    rows = con.execute("SELECT id, name FROM contacts WHERE name_search IS NULL").fetchall()
+    for contact_id, name in rows:
+        index_contact_name(con, contact_id, name)
+    return len(rows)
+
+def _migration_name_search(con):
+    """v3: busca por nome sem acento/caixa. name_search guarda o nome normalizado
+    e name_tokens cada palavra; a busca (build_filters) usa só name_tokens."""
+    con.execute("ALTER TABLE contacts ADD COLUMN name_search TEXT")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS name_tokens (
+            token TEXT NOT NULL,
+            contact_id INTEGER NOT NULL,
+            PRIMARY KEY (token, contact_id)
+        ) WITHOUT ROWID
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_name_tokens_contact ON name_tokens(contact_id)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_contacts_name_search ON contacts(name_search)")
+    # apagar um contato (por qualquer ferramenta) limpa os tokens dele
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contacts_name_tokens_ad AFTER DELETE ON contacts
+        BEGIN
+            DELETE FROM name_tokens WHERE contact_id = old.id;
+        END
+        """
+    )
+    index_missing_names(con)
 
-    def add_col(col_name, col_type="TEXT"):
-        cur.execute(f"ALTER TABLE contacts ADD COLUMN {col_name} {col_type}")
-        con.commit()
+def _migration_change_journal(con):
+    """v4: diário de alterações (gravado por triggers, vale para qualquer processo).
+    Outras instâncias leem só o que mudou desde o último seq visto."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS contacts_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            contact_id INTEGER NOT NULL
+        )
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contacts_changes_ai AFTER INSERT ON contacts
+        BEGIN
+            INSERT INTO contacts_changes (contact_id) VALUES (new.id);
+        END
+        """
+    )
+    # name_search fica de fora: é derivado de name, que já está na lista
+    con.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS contacts_changes_au
+        AFTER UPDATE OF {', '.join(k for k, _ in COLUMNS)} ON contacts
+        BEGIN
+            INSERT INTO contacts_changes (contact_id) VALUES (new.id);
+        END
+        """
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contacts_changes_ad AFTER DELETE ON contacts
+        BEGIN
+            INSERT INTO contacts_changes (contact_id) VALUES (old.id);
+        END
+        """
+    )
 
-    for col in ["monthly_fee", "how_found", "course_for", "attended_by"]:
-        if col not in cols:
-            add_col(col)
+def prune_change_journal(con, keep=None) -> int:
+    """Apaga entradas antigas do diário, mantendo as `keep` mais recentes."""
+    keep = CHANGE_JOURNAL_KEEP if keep is None else keep
+    return con.execute(
+        "DELETE FROM contacts_changes WHERE seq <= (SELECT MAX(seq) FROM contacts_changes) - ?", (keep,)
+    ).rowcount
+
+def _migration_maintenance_log(con):
+    """v5: histórico das rotinas de manutenção (tamanho, páginas livres e tempo)."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            task TEXT NOT NULL,
+            duration_s REAL,
+            size_before INTEGER,
+            size_after INTEGER,
+            freelist_before INTEGER,
+            freelist_after INTEGER,
+            result TEXT
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)")
+
+def _migration_name_search_refresh(con):
+    """v6: renomear por fora do app zera name_search, marcando o contato para ser
+    reindexado na próxima abertura. name_search passa a servir só de marcador
+    "precisa indexar": o índice completo vira um índice parcial dos pendentes."""
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS contacts_name_search_au AFTER UPDATE OF name ON contacts
+        BEGIN
+            UPDATE contacts SET name_search = NULL WHERE id = new.id;
+        END
+        """
+    )
+    con.execute("DROP INDEX IF EXISTS idx_contacts_name_search")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_contacts_name_pending ON contacts(id) WHERE name_search IS NULL")
+
+# (versão, função, roda ANALYZE depois?) - sempre em ordem crescente; nunca
+# altere uma migração já publicada, crie uma nova.
+MIGRATIONS = [
+    (1, _migration_base_schema, False),
+    (2, _migration_filter_indexes, True),
+    (3, _migration_name_search, True),
+    (4, _migration_change_journal, False),
+    (5, _migration_maintenance_log, False),
+    (6, _migration_name_search_refresh, False),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def init_db(path=DB_FILE):
+    """Leva o banco até SCHEMA_VERSION usando PRAGMA user_version.
+
+    Se o banco já está na versão atual, é só uma leitura do cabeçalho. Cada
+    migração roda na sua própria transação junto com o novo user_version, então
+    uma falha não deixa o schema pela metade.
+    """
+    con = sqlite3.connect(path, isolation_level=None)
+    try:
+        if con.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        if con.execute("PRAGMA page_count").fetchone()[0] == 0:
+            # banco novo: auto_vacuum só pode ser ligado antes da primeira tabela
+            con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+        analyze = False
+        for version, migrate, heavy in MIGRATIONS:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                # relido dentro da transação: outra instância pode ter migrado antes
+                if con.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    con.execute("ROLLBACK")
+                    continue
+                migrate(con)
+                con.execute(f"PRAGMA user_version = {version}")
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            analyze = analyze or heavy
+
+        if analyze:
+            con.execute("ANALYZE")
+    finally:
+        con.close()
+
+# --------------------- Várias unidades (busca federada) ---------------------
+UNITS_FILE = "units.json"        # unidades registradas: [{"name": ..., "path": ...}]
+FEDERATED_MAX_WORKERS = 8
+FEDERATED_LIMIT = 2000           # linhas exibidas no total (as primeiras pela ordenação ativa)
+FEDERATED_BATCH = 200            # linhas por mensagem da thread para a interface
 
-    con.close()
+def units_file() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), UNITS_FILE)
+
+def load_units() -> list[dict]:
+    try:
+        with open(units_file(), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+def save_units(units: list[dict]):
+    with open(units_file(), "w", encoding="utf-8") as f:
+        json.dump(units, f, ensure_ascii=False, indent=2)
+
+def is_contacts_db(path: str) -> bool:
+    try:
+        con = sqlite3.connect(Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True)
+        try:
+            return con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contacts'"
+            ).fetchone() is not None
+        finally:
+            con.close()
+    except sqlite3.DatabaseError:
+        return False
+
+def unit_schema_version(path: str) -> int:
+    """PRAGMA user_version do banco da unidade, lido sem gravar nada (mode=ro)."""
+    con = sqlite3.connect(Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True)
+    try:
+        return con.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        con.close()
+
+def query_unit(path: str, clause: str, params, col: str, descending: bool, limit: int = FEDERATED_LIMIT):
+    """Roda o filtro de build_filters num banco de unidade (somente leitura).
+
+    Devolve (linhas, total, matrículas): as `limit` primeiras linhas pela
+    ordenação (col, descending), já ordenadas. Para id e colunas de texto o
+    ORDER BY ... LIMIT fica no SQLite (id sai direto do rowid); só data e
+    mensalidade, cujo texto gravado não ordena certo, passam pelo heap em Python.
+    """
+    con = sqlite3.connect(Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True)
+    try:
+        total, enrolled = con.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(status = 'Fechou matrícula'), 0) FROM contacts{clause}", params
+        ).fetchone()
+        select = f"SELECT {', '.join(k for k, _ in COLUMNS)} FROM contacts{clause}"
+        if col not in ("visit_date", "monthly_fee"):
+            direction = "DESC" if descending else "ASC"
+            # lower(COALESCE(...)) = sort_key para texto (lower() do SQLite só muda ASCII)
+            order = "id" if col == "id" else f"lower(COALESCE({col}, '')) {direction}, id"
+            rows = con.execute(f"{select} ORDER BY {order} {direction} LIMIT ?", [*params, limit]).fetchall()
+            return rows, total, enrolled
+        cur = con.execute(select, params)
+        i = [k for k, _ in COLUMNS].index(col)
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        rows = pick(limit, cur, key=lambda r: sort_key(col, r[i]))
+        return rows, total, enrolled
+    finally:
+        con.close()
+
+# --------------------- Exportação XLSX (sem dependências) ---------------------
+XLSX_SHEET_NAME = "Contatos"
+XLSX_FLUSH_ROWS = 500   # linhas acumuladas antes de gravar no zip
+XLSX_DATE_BASE = datetime.date(1899, 12, 30)  # dia 0 do Excel
+
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_XLSX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>"""
+
+_XLSX_ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_XLSX_WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>"""
+
+# estilos: 0 = padrão, 1 = data dd/mm/aaaa, 2 = moeda 1.234,56, 3 = cabeçalho em negrito
+_XLSX_STYLES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="dd/mm/yyyy"/><numFmt numFmtId="165" formatCode="#,##0.00"/></numFmts>
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+def _xlsx_col(n: int) -> str:
+    """0 -> A, 25 -> Z, 26 -> AA..."""
+    s = ""
+    n += 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+def _xlsx_str_cell(ref: str, value, style: int = 0) -> str:
+    text = _XML_ILLEGAL.sub("", str(value))
+    if not text:
+        return ""
+    s = f' s="{style}"' if style else ""
+    return f'<c r="{ref}" t="inlineStr"{s}><is><t xml:space="preserve">{xml_escape(text)}</t></is></c>'
+
+def _xlsx_cell(ref: str, key: str, value) -> str:
+    """Célula tipada: id e mensalidade como número, data da visita como data real."""
+    if value is None or value == "":
+        return ""
+    if key == "id":
+        return f'<c r="{ref}"><v>{int(value)}</v></c>'
+    if key == "visit_date":
+        try:
+            d = datetime.datetime.strptime(value, DATE_FMT).date()
+            return f'<c r="{ref}" s="1"><v>{(d - XLSX_DATE_BASE).days}</v></c>'
+        except (TypeError, ValueError):
+            pass
+    elif key == "monthly_fee":
+        try:
+            fee = float(str(value).replace("R$", "").strip().replace(".", "").replace(",", "."))
+            if math.isfinite(fee):  # "nan"/"inf" viram texto: o Excel rejeita <v>nan</v>
+                return f'<c r="{ref}" s="2"><v>{fee!r}</v></c>'
+        except ValueError:
+            pass
+    return _xlsx_str_cell(ref, value)
+
+def write_xlsx(path: str, rows) -> int:
+    """Grava `rows` (tuplas na ordem de COLUMNS; pode ser um cursor) num .xlsx.
+
+    A planilha é escrita direto no zip em blocos, sem montar tudo em memória,
+    com cabeçalho congelado e autofiltro. Devolve o número de linhas gravadas.
+    """
+    keys = [k for k, _ in COLUMNS]
+    letters = [_xlsx_col(i) for i in range(len(COLUMNS))]
+    last_col = letters[-1]
+    cols_xml = "".join(
+        f'<col min="{i + 1}" max="{i + 1}" width="{COLUMN_WIDTHS.get(k, 120) / 7:.1f}" customWidth="1"/>'
+        for i, k in enumerate(keys)
+    )
+
+    n = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as f:
+            f.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                '<sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+                '<selection pane="bottomLeft" activeCell="A2" sqref="A2"/>'
+                '</sheetView></sheetViews>'
+                f'<cols>{cols_xml}</cols><sheetData>'
+                '<row r="1">'
+                + "".join(_xlsx_str_cell(f"{letters[i]}1", label, 3) for i, (_, label) in enumerate(COLUMNS))
+                + '</row>'
+            ).encode("utf-8"))
+
+            buf = []
+            for row in rows:
+                r = n + 2
+                cells = "".join(_xlsx_cell(f"{letters[i]}{r}", keys[i], v) for i, v in enumerate(row))
+                buf.append(f'<row r="{r}">{cells}</row>')
+                n += 1
+                if len(buf) >= XLSX_FLUSH_ROWS:
+                    f.write("".join(buf).encode("utf-8"))
+                    buf.clear()
+            f.write("".join(buf).encode("utf-8"))
+
+            ref = f"A1:{last_col}{n + 1}"
+            f.write(f'</sheetData><autoFilter ref="{ref}"/></worksheet>'.encode("utf-8"))
+
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_ROOT_RELS)
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", _XLSX_STYLES)
+        zf.writestr("xl/workbook.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{XLSX_SHEET_NAME}" sheetId="1" r:id="rId1"/></sheets>'
+            '<definedNames><definedName name="_xlnm._FilterDatabase" localSheetId="0" hidden="1">'
+            f"'{XLSX_SHEET_NAME}'!$A$1:${last_col}${n + 1}"
+            '</definedName></definedNames></workbook>'
+        ))
+    return n
+
+# --------------------- Backup (API de backup do SQLite) ---------------------
+BACKUP_DIR = "backups"
+BACKUP_LOG = "backups.csv"          # métricas de cada backup (dentro de BACKUP_DIR)
+BACKUP_PAGES_PER_STEP = 256         # páginas copiadas por passo (não trava escritas)
+BACKUP_STEP_SLEEP = 0.005           # pausa entre passos (segundos)
+BACKUP_KEEP_LAST = 10               # sempre mantém os N mais recentes...
+BACKUP_KEEP_DAYS = 30               # ...e um por dia nos últimos N dias
+BACKUP_PRE_RESTORE_KEEP_DAYS = 90   # cópias "pre-restore" têm retenção própria (e a última nunca sai)
+BACKUP_INTERVAL_MS = 60 * 60 * 1000 # backup automático a cada 1h
+BACKUP_TMP_SUFFIX = ".tmp"          # cópia em andamento; só vira contacts-*.db depois do integrity_check
+
+def backup_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(DB_FILE)), BACKUP_DIR)
+
+def list_backups() -> list[str]:
+    """Snapshots existentes, do mais recente para o mais antigo."""
+    folder = backup_dir()
+    if not os.path.isdir(folder):
+        return []
+    # arquivos temporários (.db.tmp e seus -journal) nunca são pontos de restauração
+    files = [os.path.join(folder, f) for f in os.listdir(folder)
+             if f.startswith("contacts-") and f.endswith(".db")]
+    return sorted(
+        files,
+        key=lambda p: (_backup_timestamp(p) or datetime.datetime.min, os.path.getmtime(p)),
+        reverse=True,
+    )
+
+def _backup_timestamp(path: str) -> datetime.datetime | None:
+    m = re.match(r"contacts-(\d{8}-\d{6})", os.path.basename(path))
+    if not m:
+        return None
+    try:
+        return datetime.datetime.strptime(m.group(1), "%Y%m%d-%H%M%S")
+    except ValueError:
+        return None
+
+def integrity_check(path: str) -> str:
+    """Roda PRAGMA integrity_check e devolve 'ok' ou a primeira mensagem de erro."""
+    con = sqlite3.connect(path)
+    try:
+        row = con.execute("PRAGMA integrity_check").fetchone()
+        return row[0] if row else "sem resposta"
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        con.close()
+
+def _copy_db(src_path: str, dst_path: str) -> int:
+    """Copia src -> dst em passos de BACKUP_PAGES_PER_STEP; devolve o total de páginas."""
+    pages = [0]
+
+    def progress(_status, _remaining, total):
+        pages[0] = total
+
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+    return pages[0]
+
+def _remove_tmp(path: str):
+    """Apaga uma cópia temporária e o journal que o SQLite possa ter deixado."""
+    for p in (path, path + "-journal"):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+def _log_backup(metrics: dict):
+    path = os.path.join(backup_dir(), BACKUP_LOG)
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        if new_file:
+            w.writerow(["data", "arquivo", "tipo", "duracao_s", "tamanho_bytes", "paginas", "integridade"])
+        w.writerow([
+            metrics["when"].strftime("%Y-%m-%d %H:%M:%S"),
+            os.path.basename(metrics["path"]),
+            metrics["kind"],
+            f"{metrics['duration']:.3f}",
+            metrics["size"],
+            metrics["pages"],
+            metrics["integrity"],
+        ])
+
+def read_backup_log() -> dict[str, dict]:
+    """Métricas registradas, indexadas pelo nome do arquivo."""
+    path = os.path.join(backup_dir(), BACKUP_LOG)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["arquivo"]: row for row in csv.DictReader(f, delimiter=";")}
+
+def run_backup(kind: str = "manual") -> dict:
+    """Cria um snapshot de DB_FILE, verifica a integridade e aplica a retenção.
+
+    Usa sqlite3.Connection.backup em passos, então pode rodar numa thread
+    enquanto o app continua lendo e gravando. A cópia é feita num arquivo
+    temporário e só recebe o nome final (os.replace) depois de passar no
+    integrity_check; se falhar ou der erro no meio, o temporário é apagado.
+    """
+    folder = backup_dir()
+    os.makedirs(folder, exist_ok=True)
+    for f in os.listdir(folder):  # sobras de um backup interrompido (app encerrado no meio)
+        if f.startswith("contacts-") and BACKUP_TMP_SUFFIX in f:
+            _remove_tmp(os.path.join(folder, f))
+    when = datetime.datetime.now()
+    suffix = "" if kind in ("manual", "auto") else f"-{kind}"
+    path = os.path.join(folder, f"contacts-{when:%Y%m%d-%H%M%S}{suffix}.db")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(folder, f"contacts-{when:%Y%m%d-%H%M%S}{suffix}-{n}.db")
+        n += 1
+
+    tmp = path + BACKUP_TMP_SUFFIX
+    t0 = time.perf_counter()
+    try:
+        pages = _copy_db(DB_FILE, tmp)
+        integrity = integrity_check(tmp)
+        size = os.path.getsize(tmp)
+        if integrity == "ok":
+            os.replace(tmp, path)
+    finally:
+        _remove_tmp(tmp)
+    duration = time.perf_counter() - t0
+
+    metrics = {
+        "when": when, "path": path, "kind": kind, "duration": duration,
+        "size": size, "pages": pages, "integrity": integrity,
+    }
+    _log_backup(metrics)
+    prune_backups()
+    return metrics
+
+def prune_backups(now: datetime.datetime | None = None) -> list[str]:
+    """Retenção: mantém os BACKUP_KEEP_LAST mais recentes e o mais recente de cada
+    dia dentro de BACKUP_KEEP_DAYS. As cópias "pre-restore" (estado antes de uma
+    restauração) ficam fora dessa rotação: duram BACKUP_PRE_RESTORE_KEEP_DAYS e a
+    mais recente é sempre mantida. Devolve a lista de arquivos removidos."""
+    now = now or datetime.datetime.now()
+    backups = list_backups()
+    regular = [p for p in backups if "-pre-restore" not in os.path.basename(p)]
+    pre_restore = [p for p in backups if "-pre-restore" in os.path.basename(p)]
+
+    removed = []
+    for i, path in enumerate(pre_restore):
+        ts = _backup_timestamp(path)
+        if i > 0 and ts is not None and (now - ts).days >= BACKUP_PRE_RESTORE_KEEP_DAYS:
+            os.remove(path)
+            removed.append(path)
+
+    keep, seen_days = set(), set()
+    for i, path in enumerate(regular):
+        ts = _backup_timestamp(path)
+        if i < BACKUP_KEEP_LAST or ts is None:
+            keep.add(path)
+        elif (now - ts).days < BACKUP_KEEP_DAYS and ts.date() not in seen_days:
+            keep.add(path)
+        if ts is not None:
+            seen_days.add(ts.date())
+        if path not in keep:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+def restore_backup(path: str) -> dict:
+    """Restaura um snapshot sobre DB_FILE (após verificar o snapshot e salvar o estado atual)."""
+    result = integrity_check(path)
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"Backup inválido ({result})")
+    safety = run_backup(kind="pre-restore")
+    _copy_db(path, DB_FILE)
+    init_db()  # snapshots antigos podem estar numa versão anterior do schema
+    return safety
+
+# --------------------- Manutenção do banco ---------------------
+MAINT_CHECK_MS = 60 * 1000        # de quanto em quanto tempo o agendador olha a fila
+MAINT_IDLE_SECONDS = 120          # sem teclado/mouse há N s = ocioso
+MAINT_VACUUM_MIN_FREE = 64        # roda incremental_vacuum a partir de N páginas livres
+MAINT_VACUUM_PAGES = 1000         # páginas devolvidas ao disco por execução
+MAINT_ANALYZE_DAYS = 7
+MAINT_STATS_DRIFT = 2             # refaz ANALYZE se a tabela cresceu/encolheu N vezes
+MAINT_INTEGRITY_DAYS = 7
+MAINT_RETRY_HOURS = 24            # tarefa que falhou só volta à fila ociosa depois de N h
+
+MAINT_TASKS = {
+    "optimize": "PRAGMA optimize",
+    "incremental_vacuum": "Vacuum incremental",
+    "analyze": "ANALYZE",
+    "integrity_check": "Verificação de integridade",
+    "vacuum_convert": "Converter para vacuum incremental",
+}
+
+def db_stats(con) -> tuple[int, int]:
+    """(tamanho em bytes, páginas livres) do banco da conexão."""
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    page_count = con.execute("PRAGMA page_count").fetchone()[0]
+    freelist = con.execute("PRAGMA freelist_count").fetchone()[0]
+    return page_size * page_count, freelist
+
+def maintenance_ok(task: str, result: str) -> bool:
+    """Execução bem-sucedida? integrity_check só conta com resultado 'ok'."""
+    return result == "ok" if task == "integrity_check" else not result.startswith("erro")
+
+def last_maintenance(con, task) -> datetime.datetime | None:
+    """Início da última execução bem-sucedida da tarefa."""
+    row = con.execute(
+        "SELECT MAX(started_at) FROM maintenance_log WHERE task = ? "
+        "AND (result = 'ok' OR (task != 'integrity_check' AND result NOT LIKE 'erro%'))", (task,)
+    ).fetchone()
+    return datetime.datetime.fromisoformat(row[0]) if row and row[0] else None
+
+def failed_recently(con, task, now: datetime.datetime) -> bool:
+    """True se a última execução da tarefa deu erro (ou, no vacuum, não devolveu
+    nenhuma página) há menos de MAINT_RETRY_HOURS."""
+    row = con.execute(
+        "SELECT started_at, result, freelist_before, freelist_after FROM maintenance_log "
+        "WHERE task = ? ORDER BY id DESC LIMIT 1", (task,)
+    ).fetchone()
+    if not row or now - datetime.datetime.fromisoformat(row[0]) >= datetime.timedelta(hours=MAINT_RETRY_HOURS):
+        return False
+    if task == "incremental_vacuum" and row[3] >= row[2]:
+        return True
+    return not maintenance_ok(task, row[1])
+
+def maintenance_due(con, now: datetime.datetime | None = None) -> str | None:
+    """Próxima tarefa pendente para um período ocioso (ou None).
+
+    A conversão para auto_vacuum=INCREMENTAL (VACUUM completo) nunca entra aqui:
+    é manual, em "Manutenção do banco"."""
+    now = now or datetime.datetime.now()
+    # as semanais primeiro: um freelist grande não pode segurá-las na fila
+    for task, days in (("analyze", MAINT_ANALYZE_DAYS), ("integrity_check", MAINT_INTEGRITY_DAYS)):
+        if failed_recently(con, task, now):
+            continue
+        last = last_maintenance(con, task)
+        if last is None or now - last >= datetime.timedelta(days=days):
+            return task
+    if (con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+            and con.execute("PRAGMA freelist_count").fetchone()[0] >= MAINT_VACUUM_MIN_FREE
+            and not failed_recently(con, "incremental_vacuum", now)):
+        return "incremental_vacuum"
+    return None
+
+def run_maintenance(task: str, path: str = DB_FILE) -> dict:
+    """Executa uma tarefa de manutenção numa conexão própria e registra o efeito
+    (tamanho e páginas livres antes/depois, duração) em maintenance_log."""
+    con = sqlite3.connect(path, isolation_level=None, timeout=10)
+    try:
+        started = datetime.datetime.now()
+        size_before, free_before = db_stats(con)
+        t0 = time.perf_counter()
+        result = "ok"
+        try:
+            if task == "optimize":
+                con.execute("PRAGMA analysis_limit = 400")  # ANALYZE aproximado, custo limitado
+                # numa conexão nova o optimize não tem consultas para olhar (e o flag
+                # 0x10000 "todas as tabelas" só existe no SQLite >= 3.46); por isso a
+                # checagem de estatísticas faltando/velhas é feita aqui mesmo
+                stat = None
+                if con.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+                    stat = con.execute(
+                        "SELECT stat FROM sqlite_stat1 WHERE tbl = 'contacts' LIMIT 1"
+                    ).fetchone()
+                rows = con.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+                est = int(stat[0].split()[0]) if stat else None
+                if est is None or not est / MAINT_STATS_DRIFT <= rows <= est * MAINT_STATS_DRIFT:
+                    con.execute("ANALYZE")
+                    result = f"ok (ANALYZE: estatísticas de {est if est is not None else '-'} linhas, tabela com {rows})"
+                else:
+                    con.execute("PRAGMA optimize=0x10002").fetchall()
+            elif task == "incremental_vacuum":
+                if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    result = "ignorado: banco não está em auto_vacuum=INCREMENTAL"
+                else:
+                    # via execute() o módulo sqlite3 dá um único passo no pragma (sem colunas
+                    # de resultado) e só uma página é devolvida; executescript roda até o fim
+                    con.executescript(f"PRAGMA incremental_vacuum({MAINT_VACUUM_PAGES});")
+            elif task == "vacuum_convert":
+                if con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                    result = "já está em auto_vacuum=INCREMENTAL"
+                else:
+                    # bancos antigos: só vale depois de um VACUUM completo (reescreve o arquivo)
+                    con.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    con.execute("VACUUM")
+                    result = "convertido para auto_vacuum=INCREMENTAL"
+            elif task == "analyze":
+                con.execute("ANALYZE")
+            elif task == "integrity_check":
+                result = con.execute("PRAGMA integrity_check").fetchone()[0]
+            else:
+                raise ValueError(f"tarefa desconhecida: {task}")
+        except sqlite3.Error as e:
+            result = f"erro: {e}"
+        duration = time.perf_counter() - t0
+        size_after, free_after = db_stats(con)
+
+        entry = {
+            "started_at": started.isoformat(timespec="seconds"), "task": task,
+            "duration_s": round(duration, 3),
+            "size_before": size_before, "size_after": size_after,
+            "freelist_before": free_before, "freelist_after": free_after,
+            "result": result,
+        }
+        con.execute(
+            f"INSERT INTO maintenance_log ({', '.join(entry)}) VALUES ({', '.join('?' * len(entry))})",
+            list(entry.values()),
+        )
+        return entry
+    finally:
+        con.close()
 
 class App(tk.Tk):
     def __init__(self):
@@ -146,24 +993,73 @@ class App(tk.Tk):
         self.var_attended_by = tk.StringVar()
         self.var_notes = tk.StringVar()  # fallback se Text não existir
 
+        # (cláusula, parâmetros) do filtro usado na última carga da tabela
+        self._table_filter = ("", [])
+        # ordenação ativa da tabela (coluna, decrescente?)
+        self._sort = ("id", True)
+        # índices de autocompletar ("name", "attended_by"), montados no primeiro uso
+        self._ac_indexes = {}
+
         self.create_menu()
         self.create_topbar()
         self.create_form()
         self.create_table()
         self.bind_events()
 
+        # contatos gravados por outra ferramenta ficam sem name_search (consulta via índice)
+        con = self.get_conn()
+        with con:
+            index_missing_names(con)
+            prune_change_journal(con)
+        con.close()
+
+        # Alterações feitas por outras instâncias (mesmo contacts.db): conexão fixa
+        # só para ler PRAGMA data_version, que muda quando outra conexão grava.
+        # A base (seq/data_version) é lida ANTES da primeira carga: o que for gravado
+        # entre as duas é reaplicado pelo poller, em vez de se perder.
+        # timeout=0: o poll roda na thread do Tk a cada segundo; banco bloqueado
+        # por outro escritor falha na hora e tenta de novo no próximo ciclo
+        self._watch_con = sqlite3.connect(DB_FILE, isolation_level=None, timeout=0)
+        self._reset_change_tracking()
+        self.after(CHANGE_POLL_MS, self._poll_changes)
+
         self.refresh_filter_options()
         self.refresh_table()
 
+        # Backup automático: um logo após abrir e depois a cada BACKUP_INTERVAL_MS
+        self._backup_running = False
+        self._closing = False
+        self.after(5000, self._auto_backup)
+
+        # Manutenção em segundo plano nos períodos sem uso (teclado/mouse)
+        self._maintenance_running = False
+        self._last_activity = time.monotonic()
+        for seq in ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.bind_all(seq, self._touch_activity, add="+")
+        self.after(MAINT_CHECK_MS, self._maintenance_tick)
+        self.after(1000, self._warn_last_integrity)  # falha numa verificação anterior
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
     # --------------------- UI: menu e topbar ---------------------
     def create_menu(self):
         menubar = tk.Menu(self)
         filemenu = tk.Menu(menubar, tearoff=0)
         filemenu.add_command(label="Exportar CSV...", command=self.export_csv)
+        filemenu.add_command(label="Exportar Excel (.xlsx)...", command=self.export_xlsx)
+        filemenu.add_command(label="Manutenção do banco...", command=self.show_maintenance)
         filemenu.add_separator()
-        filemenu.add_command(label="Sair", command=self.quit)
+        filemenu.add_command(label="Sair", command=self.on_close)
         menubar.add_cascade(label="Arquivo", menu=filemenu)
 
+        backupmenu = tk.Menu(menubar, tearoff=0)
+        backupmenu.add_command(label="Fazer backup agora", command=self.backup_now)
+        backupmenu.add_command(label="Backups e restauração...", command=self.show_backups)
+        menubar.add_cascade(label="Backup", menu=backupmenu)
+
+        unitsmenu = tk.Menu(menubar, tearoff=0)
+        unitsmenu.add_command(label="Buscar em todas as unidades...", command=self.show_federated)
+        menubar.add_cascade(label="Unidades", menu=unitsmenu)
+
         helpmenu = tk.Menu(menubar, tearoff=0)
         helpmenu.add_command(label="Sobre", command=self.show_about)
         menubar.add_cascade(label="Ajuda", menu=helpmenu)
@@ -181,6 +1077,7 @@ class App(tk.Tk):
         ttk.Label(search_row, text="Buscar por nome:").grid(row=0, column=0, sticky=tk.W, padx=(0, 6))
         e_name = ttk.Entry(search_row, textvariable=self.var_search)
         e_name.grid(row=0, column=1, sticky="ew", padx=(0, 18))   # << cresce
+        self.attach_autocomplete(e_name, self.var_search, "name")
 
         ttk.Label(search_row, text="Buscar por telefone:").grid(row=0, column=2, sticky=tk.W, padx=(0, 6))
         e_phone = ttk.Entry(search_row, textvariable=self.var_filter_phone)
@@ -245,7 +1142,8 @@ class App(tk.Tk):
 
         ttk.Button(filt_row, text="Aplicar", command=self.refresh_table).grid(row=0, column=c, padx=(0, 6)); c += 1
         ttk.Button(filt_row, text="Limpar filtros", command=self.clear_filters).grid(row=0, column=c, padx=(0, 6)); c += 1
-        ttk.Button(filt_row, text="Exportar CSV", command=self.export_csv).grid(row=0, column=c)
+        ttk.Button(filt_row, text="Exportar CSV", command=self.export_csv).grid(row=0, column=c, padx=(0, 6)); c += 1
+        ttk.Button(filt_row, text="Exportar Excel", command=self.export_xlsx).grid(row=0, column=c)
 
         # Autoformatação de datas nos filtros
         self.attach_date_autofmt(e_from, self.var_filter_from)
@@ -298,7 +1196,7 @@ class App(tk.Tk):
         # Status
         status_cb = ttk.Combobox(
             row_top, textvariable=self.var_status,
-            values=["Novo", "Em contato", "Retornar ligação", "Fechou matrícula", "Sem interesse"],
+            values=STATUSES,
             width=18, state="readonly"
         )
         status_cb.grid(row=1, column=c, padx=(0, 12), sticky=tk.W); c += 1
@@ -330,8 +1228,9 @@ class App(tk.Tk):
         for_cb.grid(row=1, column=1, padx=(0,12), sticky=tk.W)
 
         ttk.Label(row_mid, text="Atendido por").grid(row=0, column=2, sticky=tk.W)
-        ttk.Entry(row_mid, textvariable=self.var_attended_by, width=25)\
-            .grid(row=1, column=2, padx=(0,0), sticky=tk.W)
+        e_att = ttk.Entry(row_mid, textvariable=self.var_attended_by, width=25)
+        e_att.grid(row=1, column=2, padx=(0,0), sticky=tk.W)
+        self.attach_autocomplete(e_att, self.var_attended_by, "attended_by")
 
         # ===== Observações: metade da altura =====
         notes_block = ttk.LabelFrame(self, text="Observações", padding=(10, 6))
@@ -353,6 +1252,8 @@ class App(tk.Tk):
         ttk.Button(btns, text="Salvar", command=self.save_contact).pack(side=tk.LEFT, padx=6)
         ttk.Button(btns, text="Atualizar selecionado", command=self.update_selected).pack(side=tk.LEFT, padx=6)
         ttk.Button(btns, text="Apagar selecionado", command=self.delete_selected).pack(side=tk.LEFT, padx=6)
+        ttk.Button(btns, text="Selecionar todos (filtro)", command=self.select_all).pack(side=tk.LEFT, padx=(18, 6))
+        ttk.Button(btns, text="Edição em massa...", command=self.bulk_edit).pack(side=tk.LEFT, padx=6)
 
 
     # --------------------- Tabela ---------------------
@@ -364,7 +1265,7 @@ class App(tk.Tk):
         table_frame.columnconfigure(0, weight=1)
 
         cols = [c[0] for c in COLUMNS]
-        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", selectmode="browse")
+        self.tree = ttk.Treeview(table_frame, columns=cols, show="headings", selectmode="extended")
         self.tree.grid(row=0, column=0, sticky="nsew")
 
         vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.tree.yview)
@@ -375,16 +1276,12 @@ class App(tk.Tk):
 
         self.tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
 
-        widths = {
-            "id": 60, "name": 220, "phone": 130, "email": 220, "course": 160,
-            "visit_date": 130, "status": 160, "monthly_fee": 140,
-            "how_found": 190, "course_for": 150, "attended_by": 150, "notes": 800
-        }
         for key, label in COLUMNS:
             self.tree.heading(key, text=label, command=lambda k=key: self.sort_by(k, False))
-            self.tree.column(key, width=widths.get(key, 120), anchor=tk.W)
+            self.tree.column(key, width=COLUMN_WIDTHS.get(key, 120), anchor=tk.W)
 
         self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<Control-a>", lambda e: (self.select_all(), "break")[1])
 
     # --------------------- Eventos / Filtros ---------------------
     def bind_events(self):
@@ -465,10 +1362,11 @@ class App(tk.Tk):
         where = []
         params = []
 
-        q = self.var_search.get().strip()
-        if q:
-            where.append("name LIKE ?")
-            params.append(f"%{q}%")
+        # cada palavra digitada precisa ser início de alguma palavra do nome
+        # ("jose sil" acha "José da Silva"); sem acento/caixa e via índice
+        for tok in normalize_search(self.var_search.get()).split():
+            where.append("id IN (SELECT contact_id FROM name_tokens WHERE token >= ? AND token < ?)")
+            params.extend(_prefix_range(tok))
 
         phone_q = re.sub(r"\D", "", self.var_filter_phone.get() or "")
         if phone_q:
@@ -492,16 +1390,14 @@ class App(tk.Tk):
         vfrom_iso = self.ddmmyyyy_to_iso(self.var_filter_from.get())
         vto_iso = self.ddmmyyyy_to_iso(self.var_filter_to.get())
 
-        visit_iso_expr = "(substr(visit_date,7,4)||'-'||substr(visit_date,4,2)||'-'||substr(visit_date,1,2))"
-
         if vfrom_iso and vto_iso:
-            where.append(f"{visit_iso_expr} BETWEEN ? AND ?")
+            where.append(f"{VISIT_ISO_EXPR} BETWEEN ? AND ?")
             params.extend([vfrom_iso, vto_iso])
         elif vfrom_iso:
-            where.append(f"{visit_iso_expr} >= ?")
+            where.append(f"{VISIT_ISO_EXPR} >= ?")
             params.append(vfrom_iso)
         elif vto_iso:
-            where.append(f"{visit_iso_expr} <= ?")
+            where.append(f"{VISIT_ISO_EXPR} <= ?")
             params.append(vto_iso)
 
         clause = (" WHERE " + " AND ".join(where)) if where else ""
@@ -515,7 +1411,8 @@ class App(tk.Tk):
                 messagebox.showerror("Erro", "Data inválida. Use dd/mm/aaaa (8 dígitos aceitos).")
                 return
 
-        # Limpa a tabela
+        # Limpa a tabela (recarregada sempre por id decrescente)
+        self._sort = ("id", True)
         for item in self.tree.get_children():
             self.tree.delete(item)
 
@@ -527,11 +1424,145 @@ class App(tk.Tk):
             FROM contacts
         """
         clause, params = self.build_filters()
+        # guardado para as atualizações incrementais
+        self._table_filter = (clause, params)
         cur.execute(base_select + clause + " ORDER BY id DESC", params)
         for row in cur.fetchall():
-            self.tree.insert("", tk.END, values=row)
+            self.tree.insert("", tk.END, iid=str(row[0]), values=row)
         con.close()
 
+    def _patch_rows(self, ids):
+        """Atualiza na tabela apenas as linhas `ids`, sem recarregar tudo.
+
+        Linhas que deixaram de existir (ou de casar com os filtros ativos) saem da
+        tabela; as alteradas são atualizadas no lugar; as novas entram no topo.
+        """
+        clause, params = self._table_filter
+        select = f"SELECT {', '.join(c[0] for c in COLUMNS)} FROM contacts{clause}"
+        select += " AND" if clause else " WHERE"
+        ids = [int(i) for i in ids]
+        found = {}
+        con = self.get_conn()
+        for i in range(0, len(ids), BULK_CHUNK):
+            chunk = ids[i:i + BULK_CHUNK]
+            cur = con.execute(f"{select} id IN ({','.join('?' * len(chunk))})", [*params, *chunk])
+            for row in cur:
+                found[row[0]] = row
+        con.close()
+
+        for contact_id in ids:
+            iid = str(contact_id)
+            row = found.get(contact_id)
+            if row is None:
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+            elif self.tree.exists(iid):
+                self.tree.item(iid, values=row)
+            else:
+                self.tree.insert("", self._sorted_index(row), iid=iid, values=row)
+
+    def _sorted_index(self, row):
+        """Posição de uma linha nova na tabela, respeitando a ordenação ativa."""
+        col, descending = self._sort
+        if (col, descending) == ("id", True):
+            return 0  # ordem padrão: ids novos vão para o topo
+        i = [k for k, _ in COLUMNS].index(col)
+        keys = [sort_key(col, self.tree.set(c, col)) for c in self.tree.get_children()]
+        k = sort_key(col, row[i])
+        if descending:
+            keys.reverse()
+            return len(keys) - bisect.bisect_left(keys, k)
+        return bisect.bisect_right(keys, k)
+
+    # --------------------- Alterações de outras instâncias ---------------------
+    def _reset_change_tracking(self):
+        # raro (abertura/restauração): aqui vale esperar um escritor como as demais conexões
+        self._watch_con.execute("PRAGMA busy_timeout = 5000")
+        try:
+            self._data_version = self._watch_con.execute("PRAGMA data_version").fetchone()[0]
+            row = self._watch_con.execute("SELECT MAX(seq) FROM contacts_changes").fetchone()
+            self._change_seq = row[0] or 0
+            # ids são AUTOINCREMENT: id acima deste = contato novo (sem valor antigo)
+            self._max_seen_id = self._watch_con.execute("SELECT MAX(id) FROM contacts").fetchone()[0] or 0
+        finally:
+            self._watch_con.execute("PRAGMA busy_timeout = 0")
+        # faixas (seq_antes, seq_depois] do diário gravadas por esta instância
+        self._own_seqs = []
+
+    def _begin_write(self, con):
+        """Abre a transação de escrita já com o lock (BEGIN IMMEDIATE) e devolve o
+        último seq do diário; o que entrar acima dele até o commit é desta instância."""
+        con.execute("BEGIN IMMEDIATE")
+        return con.execute("SELECT COALESCE(MAX(seq), 0) FROM contacts_changes").fetchone()[0]
+
+    def _commit_write(self, con, seq_before):
+        """Commit de uma escrita local, guardando os seqs dela para o poller ignorar."""
+        seq_after = con.execute("SELECT COALESCE(MAX(seq), 0) FROM contacts_changes").fetchone()[0]
+        con.commit()
+        if seq_after > seq_before:
+            self._own_seqs.append((seq_before, seq_after))
+
+    def _poll_changes(self):
+        """Checagem periódica: sem alteração custa um PRAGMA; com alteração, só as
+        linhas registradas no diário desde o último seq são relidas e atualizadas."""
+        self.after(CHANGE_POLL_MS, self._poll_changes)
+        try:
+            version = self._watch_con.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            changes = self._watch_con.execute(
+                "SELECT seq, contact_id FROM contacts_changes WHERE seq > ? ORDER BY seq",
+                (self._change_seq,),
+            ).fetchall()
+            last = self._watch_con.execute("SELECT MAX(seq) FROM contacts_changes").fetchone()[0] or 0
+        except sqlite3.Error:
+            return  # banco ocupado/bloqueado: tenta no próximo ciclo (versão não foi guardada)
+        self._data_version = version
+
+        if last < self._change_seq or (changes and changes[0][0] > self._change_seq + 1):
+            # banco restaurado ou diário podado além do último visto: recarrega tudo
+            self._reset_change_tracking()
+            self._ac_indexes.clear()
+            self.refresh_filter_options()
+            self.refresh_table()
+            return
+        if not changes:
+            return
+
+        self._change_seq = changes[-1][0]
+        # escritas desta instância já foram aplicadas na tela por quem gravou
+        own = self._own_seqs
+        ids = list(dict.fromkeys(
+            cid for seq, cid in changes if not any(lo < seq <= hi for lo, hi in own)
+        ))
+        self._own_seqs = [(lo, hi) for lo, hi in own if hi > self._change_seq]
+        if not ids:
+            return
+
+        # valores antigos vêm da tabela, antes do patch; os novos, do banco
+        old = {i: self._ac_values(str(i)) for i in ids if self.tree.exists(str(i))}
+        con = self.get_conn()
+        new = {}
+        for i in range(0, len(ids), BULK_CHUNK):
+            chunk = ids[i:i + BULK_CHUNK]
+            for cid, name, att in con.execute(
+                f"SELECT id, name, attended_by FROM contacts WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                new[cid] = (name, att)
+        con.close()
+
+        self._patch_rows(ids)
+        self.refresh_filter_options()
+
+        for cid in ids:
+            if cid in old or cid > self._max_seen_id:
+                self._autocomplete_sync(old.get(cid), new.get(cid))
+            else:
+                # alterado/apagado fora da tela: valor antigo desconhecido, remonta no próximo uso
+                self._ac_indexes.clear()
+                break
+        self._max_seen_id = max([self._max_seen_id, *new])
+
     # --------------------- Anexadores de autoformatação ---------------------
     def attach_date_autofmt(self, entry_widget, var: tk.StringVar):
         def on_keyrelease(_ev=None):
@@ -615,6 +1646,104 @@ class App(tk.Tk):
         entry_widget.bind("<KeyRelease>", on_keyrelease)
         entry_widget.bind("<FocusOut>", on_focusout)
 
+    # --------------------- Autocompletar ---------------------
+    def autocomplete_index(self, kind):
+        """Índice de `kind` ("name" ou "attended_by"), carregado do banco na primeira vez."""
+        index = self._ac_indexes.get(kind)
+        if index is None:
+            con = self.get_conn()
+            rows = con.execute(
+                f"SELECT {kind}, COUNT(*) FROM contacts "
+                f"WHERE {kind} IS NOT NULL AND {kind} <> '' GROUP BY {kind}"
+            ).fetchall()
+            con.close()
+            index = PrefixIndex(word_starts=(kind == "name"))
+            index.load(rows)
+            self._ac_indexes[kind] = index
+        return index
+
+    def _ac_values(self, iid):
+        """(nome, atendido por) de uma linha da tabela, para manter os índices em dia."""
+        vals = self.tree.item(iid, "values")
+        return vals[1], vals[10]
+
+    def _autocomplete_sync(self, old=None, new=None):
+        """Atualiza os índices já carregados após uma gravação (old/new = (nome, atendido por))."""
+        for pos, kind in enumerate(("name", "attended_by")):
+            index = self._ac_indexes.get(kind)
+            if index is None:
+                continue  # ainda não usado: será montado do banco, já atualizado
+            if old:
+                index.remove(old[pos])
+            if new:
+                index.add(new[pos])
+
+    def attach_autocomplete(self, entry_widget, var: tk.StringVar, kind):
+        popup = {"win": None, "lb": None}
+
+        def hide(_ev=None):
+            if popup["win"] is not None:
+                popup["win"].destroy()
+                popup["win"] = popup["lb"] = None
+
+        def choose(_ev=None):
+            lb = popup["lb"]
+            if lb is not None and lb.curselection():
+                var.set(lb.get(lb.curselection()[0]))
+            hide()
+            entry_widget.focus_set()
+            entry_widget.icursor(tk.END)
+            return "break"
+
+        def show(values):
+            if popup["win"] is None:
+                win = tk.Toplevel(self)
+                win.wm_overrideredirect(True)
+                lb = tk.Listbox(win, exportselection=False, activestyle="dotbox")
+                lb.pack(fill=tk.BOTH, expand=True)
+                lb.bind("<ButtonRelease-1>", choose)
+                lb.bind("<Return>", choose)
+                lb.bind("<Escape>", lambda e: (hide(), entry_widget.focus_set()))
+                lb.bind("<FocusOut>", lambda e: self.after(150, hide_if_unfocused))
+                popup.update(win=win, lb=lb)
+            lb = popup["lb"]
+            lb.delete(0, tk.END)
+            for v in values:
+                lb.insert(tk.END, v)
+            lb.configure(height=len(values))
+            x = entry_widget.winfo_rootx()
+            y = entry_widget.winfo_rooty() + entry_widget.winfo_height()
+            popup["win"].geometry(f"{entry_widget.winfo_width()}x{lb.winfo_reqheight()}+{x}+{y}")
+            popup["win"].lift()
+
+        def hide_if_unfocused():
+            if popup["lb"] is not None and self.focus_get() not in (entry_widget, popup["lb"]):
+                hide()
+
+        def on_keyrelease(ev):
+            if ev.keysym in ("Down", "Up", "Return", "Escape", "Tab") or ev.keysym.startswith(("Shift", "Control", "Alt")):
+                return
+            values = self.autocomplete_index(kind).suggest(var.get())
+            if values and values != [var.get()]:
+                show(values)
+            else:
+                hide()
+
+        def on_down(_ev=None):
+            lb = popup["lb"]
+            if lb is None:
+                return
+            lb.focus_set()
+            lb.selection_clear(0, tk.END)
+            lb.selection_set(0)
+            lb.activate(0)
+            return "break"
+
+        entry_widget.bind("<KeyRelease>", on_keyrelease, add="+")
+        entry_widget.bind("<Down>", on_down, add="+")
+        entry_widget.bind("<Escape>", hide, add="+")
+        entry_widget.bind("<FocusOut>", lambda e: self.after(150, hide_if_unfocused), add="+")
+
     # --------------------- Validação & CRUD ---------------------
     def validate_date_field(self, date_str, field_name):
         if not date_str:
@@ -656,6 +1785,7 @@ class App(tk.Tk):
         notes = self._get_notes_text()
 
         con = self.get_conn()
+        seq = self._begin_write(con)
         cur = con.cursor()
         cur.execute(
             """
@@ -677,15 +1807,18 @@ class App(tk.Tk):
                 notes,
             ),
         )
-        con.commit()
+        index_contact_name(con, cur.lastrowid, name)
+        self._commit_write(con, seq)
+        self._max_seen_id = max(self._max_seen_id, cur.lastrowid)
         con.close()
+        self._autocomplete_sync(new=(name, self.var_attended_by.get().strip()))
         self.refresh_filter_options()
         self.refresh_table()
         self.clear_form()
         messagebox.showinfo("Sucesso", "Contato salvo com sucesso.")
 
     def on_double_click(self, event):
-        item = self.tree.selection()
+        item = self.tree.identify_row(event.y) or self.tree.focus()
         if not item:
             return
         vals = self.tree.item(item, "values")
@@ -711,12 +1844,15 @@ class App(tk.Tk):
 
     def get_selected_id(self):
         sel = self.tree.selection()
-        if not sel:
+        if len(sel) != 1:
             return None
-        vals = self.tree.item(sel, "values")
+        vals = self.tree.item(sel[0], "values")
         return vals[0]
 
     def update_selected(self):
+        if len(self.tree.selection()) > 1:
+            messagebox.showwarning("Atenção", "Vários contatos selecionados. Use \"Edição em massa...\".")
+            return
         contact_id = self.get_selected_id()
         if not contact_id:
             messagebox.showwarning("Atenção", "Selecione um contato na tabela para atualizar.")
@@ -733,8 +1869,10 @@ class App(tk.Tk):
 
         monthly_fee = self.normalize_money(self.var_monthly_fee.get())
         notes = self._get_notes_text()
+        old = self._ac_values(self.tree.selection()[0])
 
         con = self.get_conn()
+        seq = self._begin_write(con)
         cur = con.cursor()
         cur.execute(
             """
@@ -758,61 +1896,161 @@ class App(tk.Tk):
                 contact_id,
             ),
         )
-        con.commit()
+        index_contact_name(con, contact_id, name)
+        self._commit_write(con, seq)
         con.close()
+        self._autocomplete_sync(old, (name, self.var_attended_by.get().strip()))
         self.refresh_filter_options()
         self.refresh_table()
         messagebox.showinfo("Sucesso", "Contato atualizado com sucesso.")
 
     def delete_selected(self):
+        if len(self.tree.selection()) > 1:
+            self.bulk_delete()
+            return
         contact_id = self.get_selected_id()
         if not contact_id:
             messagebox.showwarning("Atenção", "Selecione um contato na tabela para apagar.")
             return
         if not messagebox.askyesno("Confirmar", "Tem certeza que deseja apagar este contato?"):
             return
+        old = self._ac_values(self.tree.selection()[0])
         con = self.get_conn()
+        seq = self._begin_write(con)
         cur = con.cursor()
         cur.execute("DELETE FROM contacts WHERE id=?", (contact_id,))
-        con.commit()
+        self._commit_write(con, seq)
         con.close()
+        self._autocomplete_sync(old=old)
         self.refresh_filter_options()
         self.refresh_table()
         self.clear_form()
         messagebox.showinfo("Removido", "Contato apagado.")
 
+    # --------------------- Operações em massa ---------------------
+    def select_all(self):
+        """Seleciona todas as linhas exibidas (= todos os contatos que casam com o filtro)."""
+        self.tree.selection_set(self.tree.get_children())
+
+    def _bulk_execute(self, action_sql, ids, action_params=()):
+        """Aplica `action_sql` (UPDATE ... SET ... / DELETE FROM contacts) aos `ids`
+        numa única transação, com WHERE id IN (...) em blocos. Sempre pelos ids
+        exibidos, nunca pela cláusula do filtro: um contato que outra instância fez
+        casar com o filtro depois da carga não é alterado sem ter sido visto.
+        Devolve (ids afetados, linhas alteradas)."""
+        ids = [int(i) for i in ids]
+        con = self.get_conn()
+        try:
+            seq = self._begin_write(con)
+            count = 0
+            for i in range(0, len(ids), BULK_CHUNK):
+                chunk = ids[i:i + BULK_CHUNK]
+                count += con.execute(
+                    f"{action_sql} WHERE id IN ({','.join('?' * len(chunk))})",
+                    [*action_params, *chunk],
+                ).rowcount
+            self._commit_write(con, seq)
+        except Exception:
+            con.rollback()
+            raise
+        finally:
+            con.close()
+        return ids, count
+
+    def bulk_edit(self):
+        if not self.tree.selection():
+            messagebox.showwarning("Atenção", "Selecione um ou mais contatos na tabela.")
+            return
+
+        fields = {"Status": ("status", STATUSES, "readonly"),
+                  "Atendido por": ("attended_by", [], "normal"),
+                  "Curso/Interesse": ("course", COURSES, "readonly")}
+
+        # seleção congelada ao abrir (e janela modal): a confirmação mostra
+        # exatamente os contatos que serão alterados
+        selected = self.tree.selection()
+        n = len(selected)
+
+        win = tk.Toplevel(self)
+        win.title("Edição em massa")
+        win.transient(self)
+        win.resizable(False, False)
+        win.grab_set()
+        frm = ttk.Frame(win, padding=12)
+        frm.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(frm, text=f"{n} contato(s) selecionado(s).").grid(row=0, column=0, columnspan=2, sticky=tk.W, pady=(0, 8))
+
+        var_field = tk.StringVar(value="Status")
+        var_value = tk.StringVar()
+        ttk.Label(frm, text="Campo").grid(row=1, column=0, sticky=tk.W)
+        cb_field = ttk.Combobox(frm, textvariable=var_field, values=list(fields), state="readonly", width=20)
+        cb_field.grid(row=2, column=0, padx=(0, 12), sticky=tk.W)
+        ttk.Label(frm, text="Novo valor").grid(row=1, column=1, sticky=tk.W)
+        cb_value = ttk.Combobox(frm, textvariable=var_value, width=28)
+        cb_value.grid(row=2, column=1, sticky=tk.W)
+
+        def on_field(_ev=None):
+            _col, values, state = fields[var_field.get()]
+            if var_field.get() == "Atendido por":
+                values = [v for v in self.cb_att["values"] if v != "Todos"]
+            cb_value.configure(values=values, state=state)
+            var_value.set("")
+
+        cb_field.bind("<<ComboboxSelected>>", on_field)
+        on_field()
+
+        def apply():
+            col = fields[var_field.get()][0]
+            value = var_value.get().strip()
+            if not value:
+                messagebox.showwarning("Atenção", "Informe o novo valor.", parent=win)
+                return
+            if not messagebox.askyesno(
+                "Confirmar", f"Alterar \"{var_field.get()}\" para \"{value}\" em {n} contato(s)?", parent=win
+            ):
+                return
+            old = [self._ac_values(iid) for iid in selected if self.tree.exists(iid)]
+            ids, count = self._bulk_execute(f"UPDATE contacts SET {col} = ?", selected, (value,))
+            if col == "attended_by":
+                for o in old:
+                    self._autocomplete_sync(o, (o[0], value))
+            win.destroy()
+            self.refresh_filter_options()
+            self._patch_rows(ids)
+            messagebox.showinfo("Sucesso", f"{count} contato(s) atualizado(s).")
+
+        btns = ttk.Frame(frm)
+        btns.grid(row=3, column=0, columnspan=2, sticky="ew", pady=(12, 0))
+        ttk.Button(btns, text="Aplicar", command=apply).pack(side=tk.LEFT)
+        ttk.Button(btns, text="Apagar selecionados", command=lambda: (win.destroy(), self.bulk_delete())).pack(side=tk.LEFT, padx=6)
+        ttk.Button(btns, text="Cancelar", command=win.destroy).pack(side=tk.RIGHT)
+
+    def bulk_delete(self):
+        selected = self.tree.selection()
+        n = len(selected)
+        if not n:
+            messagebox.showwarning("Atenção", "Selecione um ou mais contatos na tabela.")
+            return
+        if not messagebox.askyesno("Confirmar", f"Tem certeza que deseja apagar {n} contato(s)?"):
+            return
+        old = [self._ac_values(iid) for iid in selected if self.tree.exists(iid)]
+        ids, count = self._bulk_execute("DELETE FROM contacts", selected)
+        for o in old:
+            self._autocomplete_sync(old=o)
+        self.tree.delete(*[str(i) for i in ids if self.tree.exists(str(i))])
+        self.refresh_filter_options()
+        self.clear_form()
+        messagebox.showinfo("Removido", f"{count} contato(s) apagado(s).")
+
     # --------------------- Ordenação e Export ---------------------
     def sort_by(self, col, descending):
         data = [(self.tree.set(child, col), child) for child in self.tree.get_children('')]
-
-        if col == "visit_date":
-            def key(v):
-                try:
-                    d = datetime.datetime.strptime(v[0], DATE_FMT).date() if v[0] else datetime.date.min
-                except Exception:
-                    d = datetime.date.min
-                return d
-        elif col == "monthly_fee":
-            def key(v):
-                s = (v[0] or "").replace(".", "").replace(",", ".")
-                try:
-                    return float(s)
-                except:
-                    return 0.0
-        elif col == "id":
-            def key(v):
-                try:
-                    return int(v[0])
-                except:
-                    return 0
-        else:
-            def key(v):
-                return (v[0] or "").lower()
-
-        data.sort(key=key, reverse=descending)
+        data.sort(key=lambda v: sort_key(col, v[0]), reverse=descending)
         for index, (_, child) in enumerate(data):
             self.tree.move(child, '', index)
         self.tree.heading(col, command=lambda: self.sort_by(col, not descending))
+        self._sort = (col, descending)
 
     def export_csv(self):
         path = filedialog.asksaveasfilename(
@@ -839,6 +2077,501 @@ class App(tk.Tk):
                 w.writerow(r)
         messagebox.showinfo("Exportado", f"Arquivo CSV salvo em:\n{path}")
 
+    def export_xlsx(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel", "*.xlsx")],
+            title="Salvar lista como Excel"
+        )
+        if not path:
+            return
+        con = self.get_conn()
+        cur = con.cursor()
+        clause, params = self.build_filters()
+        cur.execute(f"""
+            SELECT id, name, phone, email, course, visit_date, status,
+                   monthly_fee, how_found, course_for, attended_by, notes
+            FROM contacts {clause} ORDER BY id DESC
+        """, params)
+        try:
+            n = write_xlsx(path, cur)  # lê o cursor linha a linha
+        finally:
+            con.close()
+        messagebox.showinfo("Exportado", f"{n} contato(s) exportado(s) para:\n{path}")
+
+    # --------------------- Várias unidades ---------------------
+    def show_federated(self):
+        """Roda o filtro atual em todos os bancos de unidade registrados, em paralelo.
+
+        Cada unidade responde numa thread do pool; as linhas chegam por uma fila e
+        são intercaladas (merge) na tabela pela ordenação ativa da tela principal,
+        aparecendo assim que cada unidade termina.
+        """
+        units = load_units()
+        win = tk.Toplevel(self)
+        win.title("Busca em várias unidades")
+        win.geometry("1200x720")
+
+        # ---------- Unidades registradas ----------
+        top = ttk.LabelFrame(win, text="Unidades", padding=10)
+        top.pack(fill=tk.X, padx=10, pady=(10, 6))
+
+        ucols = [("unit", "Unidade", 200), ("path", "Arquivo", 460), ("total", "Contatos", 90),
+                 ("enrolled", "Matrículas", 90), ("time", "Tempo (s)", 80), ("state", "Situação", 200)]
+        utree = ttk.Treeview(top, columns=[c[0] for c in ucols], show="headings", height=5, selectmode="browse")
+        for key, label, width in ucols:
+            utree.heading(key, text=label)
+            utree.column(key, width=width, anchor=tk.W)
+        utree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        def unit_state(path):
+            try:
+                version = unit_schema_version(path)
+            except sqlite3.Error as e:
+                return f"inacessível: {e}"
+            return "" if version >= SCHEMA_VERSION else f"precisa atualizar (v{version} → v{SCHEMA_VERSION})"
+
+        def reload_units():
+            state["gen"] += 1  # descarta respostas de buscas feitas com a lista antiga
+            utree.delete(*utree.get_children())
+            for i, u in enumerate(units):
+                utree.insert("", tk.END, iid=str(i), values=(u["name"], u["path"], "", "", "", unit_state(u["path"])))
+
+        def upgrade_unit(unit):
+            """Migra o banco de outra unidade (só com confirmação; grava no arquivo dela)."""
+            if not messagebox.askyesno(
+                "Atualizar unidade",
+                f"O banco de \"{unit['name']}\" usa uma versão anterior do sistema.\n"
+                "Atualizar agora? Isso grava no arquivo da unidade (índices e tabelas novas) "
+                "e pode levar alguns segundos em bancos grandes.\n\n"
+                "Sem atualizar, a busca nessa unidade pode falhar.",
+                parent=win,
+            ):
+                return
+
+            def done(_result, error):
+                if not win.winfo_exists():
+                    return
+                if error:
+                    messagebox.showerror(
+                        "Erro", f"Não foi possível atualizar \"{unit['name']}\" "
+                                f"(arquivo somente leitura ou em uso?):\n{error}", parent=win)
+                reload_units()
+
+            self._run_in_background(lambda: init_db(unit["path"]), done)
+
+        def add_unit():
+            path = filedialog.askopenfilename(
+                parent=win, title="Banco de dados da unidade",
+                filetypes=[("SQLite", "*.db"), ("Todos os arquivos", "*.*")]
+            )
+            if not path:
+                return
+            if not is_contacts_db(path):
+                messagebox.showerror("Erro", "O arquivo não é um banco de contatos deste sistema.", parent=win)
+                return
+            name = simpledialog.askstring(
+                "Unidade", "Nome da unidade:", parent=win,
+                initialvalue=os.path.basename(os.path.dirname(path)) or os.path.basename(path)
+            )
+            if not name or not name.strip():
+                return
+            unit = {"name": name.strip(), "path": path}
+            units.append(unit)
+            save_units(units)
+            reload_units()
+            try:
+                outdated = unit_schema_version(path) < SCHEMA_VERSION
+            except sqlite3.Error:
+                outdated = False  # já aparece como inacessível na lista
+            if outdated:
+                upgrade_unit(unit)
+
+        def upgrade_selected():
+            sel = utree.selection()
+            if sel:
+                upgrade_unit(units[int(sel[0])])
+
+        def remove_unit():
+            sel = utree.selection()
+            if not sel:
+                return
+            units.pop(int(sel[0]))
+            save_units(units)
+            reload_units()
+
+        ubtns = ttk.Frame(top)
+        ubtns.pack(side=tk.LEFT, fill=tk.Y, padx=(10, 0))
+        ttk.Button(ubtns, text="Adicionar...", command=add_unit).pack(fill=tk.X)
+        ttk.Button(ubtns, text="Remover", command=remove_unit).pack(fill=tk.X, pady=6)
+        ttk.Button(ubtns, text="Atualizar banco", command=upgrade_selected).pack(fill=tk.X)
+
+        # ---------- Resultados ----------
+        col, descending = self._sort
+        labels = dict(COLUMNS)
+        bar = ttk.Frame(win, padding=(10, 0))
+        bar.pack(fill=tk.X)
+        ttk.Button(bar, text="Buscar", command=lambda: search()).pack(side=tk.LEFT)
+        ttk.Label(
+            bar, text=f"Usa os filtros da tela principal. Ordenado por {labels[col]} "
+                      f"({'decrescente' if descending else 'crescente'}), até {FEDERATED_LIMIT} linhas."
+        ).pack(side=tk.LEFT, padx=10)
+        var_progress = tk.StringVar()
+        ttk.Label(bar, textvariable=var_progress).pack(side=tk.RIGHT)
+
+        rframe = ttk.Frame(win, padding=10)
+        rframe.pack(fill=tk.BOTH, expand=True)
+        rframe.rowconfigure(0, weight=1)
+        rframe.columnconfigure(0, weight=1)
+        rcols = [("unit", "Unidade")] + COLUMNS
+        rtree = ttk.Treeview(rframe, columns=[c[0] for c in rcols], show="headings")
+        rtree.grid(row=0, column=0, sticky="nsew")
+        vsb = ttk.Scrollbar(rframe, orient="vertical", command=rtree.yview)
+        vsb.grid(row=0, column=1, sticky="ns")
+        hsb = ttk.Scrollbar(rframe, orient="horizontal", command=rtree.xview)
+        hsb.grid(row=1, column=0, sticky="ew")
+        rtree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        for key, label in rcols:
+            rtree.heading(key, text=label)
+            rtree.column(key, width=COLUMN_WIDTHS.get(key, 160), anchor=tk.W)
+
+        # keys: chaves (ordenação, unidade, id, iid) das linhas exibidas, em ordem crescente
+        state = {"gen": 0, "keys": [], "targets": [], "answered": 0, "total": 0, "enrolled": 0}
+        results = queue.Queue()
+        col_idx = [k for k, _ in COLUMNS].index(col)
+
+        def add_row(i, row):
+            unit_name = state["targets"][i]["name"]
+            keys = state["keys"]
+            k = (sort_key(col, row[col_idx]), unit_name, row[0], f"{i}:{row[0]}")
+            pos = bisect.bisect_left(keys, k)
+            index = len(keys) - pos if descending else pos  # posição na tabela
+            if index >= FEDERATED_LIMIT:
+                return
+            keys.insert(pos, k)
+            rtree.insert("", index, iid=k[3], values=(unit_name, *row))
+            if len(keys) > FEDERATED_LIMIT:
+                rtree.delete((keys.pop(0) if descending else keys.pop())[3])
+
+        def show_progress():
+            n = len(state["targets"])
+            var_progress.set(
+                f"{state['answered']}/{n} unidade(s) | {state['total']} contato(s), "
+                f"{state['enrolled']} matrícula(s) | exibindo {len(state['keys'])}"
+            )
+
+        def search():
+            if not units:
+                messagebox.showwarning("Atenção", "Adicione ao menos uma unidade.", parent=win)
+                return
+            clause, params = self.build_filters()
+            state["gen"] += 1
+            gen = state["gen"]
+            targets = list(units)
+            state.update(keys=[], targets=targets, answered=0, total=0, enrolled=0)
+            rtree.delete(*rtree.get_children())
+            for iid in utree.get_children():
+                utree.item(iid, values=(*utree.item(iid, "values")[:2], "", "", "", "consultando..."))
+            show_progress()
+
+            def work(i, unit):
+                t0 = time.perf_counter()
+                try:
+                    rows, total, enrolled = query_unit(unit["path"], clause, params, col, descending)
+                except Exception as e:
+                    results.put((gen, i, "error", str(e), time.perf_counter() - t0))
+                    return
+                for j in range(0, len(rows), FEDERATED_BATCH):
+                    results.put((gen, i, "rows", rows[j:j + FEDERATED_BATCH], None))
+                results.put((gen, i, "done", (total, enrolled), time.perf_counter() - t0))
+
+            pool = ThreadPoolExecutor(max_workers=min(FEDERATED_MAX_WORKERS, len(targets)))
+            for i, unit in enumerate(targets):
+                pool.submit(work, i, unit)
+            pool.shutdown(wait=False)
+
+        def poll():
+            if not win.winfo_exists():
+                return
+            try:
+                for _ in range(20):  # limita o trabalho por ciclo para a janela não travar
+                    gen, i, kind, data, elapsed = results.get_nowait()
+                    if gen != state["gen"]:
+                        continue  # resposta de uma busca anterior
+                    if kind == "rows":
+                        for row in data:
+                            add_row(i, row)
+                        continue
+                    state["answered"] += 1
+                    if utree.exists(str(i)):
+                        vals = utree.item(str(i), "values")[:2]
+                        if kind == "done":
+                            state["total"] += data[0]
+                            state["enrolled"] += data[1]
+                            utree.item(str(i), values=(*vals, data[0], data[1], f"{elapsed:.2f}", "ok"))
+                        else:
+                            utree.item(str(i), values=(*vals, "", "", f"{elapsed:.2f}", f"erro: {data}"))
+                    show_progress()
+            except queue.Empty:
+                pass
+            win.after(50, poll)
+
+        reload_units()
+        poll()
+
+    # --------------------- Manutenção ---------------------
+    def _touch_activity(self, _ev=None):
+        self._last_activity = time.monotonic()
+
+    def _maintenance_tick(self):
+        self.after(MAINT_CHECK_MS, self._maintenance_tick)
+        if self._maintenance_running or self._backup_running or self._closing:
+            return
+        if time.monotonic() - self._last_activity < MAINT_IDLE_SECONDS:
+            return
+        try:
+            task = maintenance_due(self._watch_con)
+        except sqlite3.Error:
+            return
+        if task:
+            self._start_maintenance(task, lambda entry, _error: self._warn_integrity(entry))
+
+    def _warn_integrity(self, entry):
+        """Avisa o usuário se uma verificação de integridade encontrou problema."""
+        if entry and entry["task"] == "integrity_check" and not maintenance_ok("integrity_check", entry["result"]):
+            messagebox.showerror(
+                "Banco de dados com problema",
+                f"A verificação de integridade de {entry['started_at']} falhou:\n{entry['result']}\n\n"
+                "Restaure um backup (Backup → Backups e restauração...) ou copie o contacts.db antes de continuar.",
+            )
+
+    def _warn_last_integrity(self):
+        con = self.get_conn()
+        try:
+            row = con.execute(
+                "SELECT started_at, task, result FROM maintenance_log "
+                "WHERE task = 'integrity_check' ORDER BY id DESC LIMIT 1"
+            ).fetchone()
+        finally:
+            con.close()
+        if row:
+            self._warn_integrity(dict(zip(("started_at", "task", "result"), row)))
+
+    def _start_maintenance(self, task, on_done=None):
+        self._maintenance_running = True
+
+        def done(entry, error):
+            self._maintenance_running = False
+            if on_done:
+                on_done(entry, error)
+
+        self._run_in_background(lambda: run_maintenance(task), done)
+
+    def on_close(self, _waiting=False):
+        """Fecha o app rodando a tarefa "optimize": ANALYZE limitado quando as
+        estatísticas de contacts faltam ou ficaram velhas; senão é quase instantâneo.
+        Um backup/restauração em andamento termina antes (a thread é daemon)."""
+        if self._closing and not _waiting:
+            return  # já está esperando para fechar
+        self._closing = True
+        if self._backup_running:
+            self.title("Follow-up System - aguardando o backup terminar...")
+            self.after(200, lambda: self.on_close(_waiting=True))
+            return
+        try:
+            if not self._maintenance_running:
+                run_maintenance("optimize")
+            self._watch_con.close()
+        except sqlite3.Error:
+            pass
+        self.destroy()
+
+    def show_maintenance(self):
+        win = tk.Toplevel(self)
+        win.title("Manutenção do banco")
+        win.geometry("1000x420")
+        win.transient(self)
+
+        cols = [("started_at", "Início", 150), ("task", "Tarefa", 170), ("duration_s", "Duração (s)", 90),
+                ("size", "Tamanho (KB) antes → depois", 190), ("free", "Páginas livres antes → depois", 190),
+                ("result", "Resultado", 200)]
+        tree = ttk.Treeview(win, columns=[c[0] for c in cols], show="headings")
+        for key, label, width in cols:
+            tree.heading(key, text=label)
+            tree.column(key, width=width, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 6))
+
+        def reload():
+            tree.delete(*tree.get_children())
+            con = self.get_conn()
+            rows = con.execute(
+                "SELECT started_at, task, duration_s, size_before, size_after, freelist_before, "
+                "freelist_after, result FROM maintenance_log ORDER BY id DESC LIMIT 200"
+            ).fetchall()
+            con.close()
+            for started, task, dur, sb, sa, fb, fa, result in rows:
+                tree.insert("", tk.END, values=(
+                    started, MAINT_TASKS.get(task, task), f"{dur:.3f}",
+                    f"{sb / 1024:.0f} → {sa / 1024:.0f}", f"{fb} → {fa}", result,
+                ))
+
+        def run(task):
+            if self._maintenance_running:
+                messagebox.showinfo("Manutenção", "Já existe uma manutenção em andamento.", parent=win)
+                return
+            if task == "vacuum_convert" and not messagebox.askyesno(
+                "Converter banco",
+                "Isto roda um VACUUM completo: reescreve o arquivo inteiro, precisa de espaço livre "
+                "em disco do tamanho do banco e bloqueia gravações até terminar.\n\nContinuar?",
+                parent=win,
+            ):
+                return
+
+            def done(entry, error):
+                if error:
+                    messagebox.showerror("Erro", f"Falha na manutenção:\n{error}", parent=win)
+                self._warn_integrity(entry)
+                if win.winfo_exists():
+                    reload()
+
+            self._start_maintenance(task, done)
+
+        btns = ttk.Frame(win)
+        btns.pack(fill=tk.X, padx=10, pady=(0, 10))
+        for task, label in MAINT_TASKS.items():
+            ttk.Button(btns, text=label, command=lambda t=task: run(t)).pack(side=tk.LEFT, padx=(0, 6))
+        ttk.Button(btns, text="Fechar", command=win.destroy).pack(side=tk.RIGHT)
+
+        reload()
+
+    # --------------------- Backup ---------------------
+    def _run_in_background(self, func, on_done):
+        """Executa func() numa thread e chama on_done(resultado, erro) na thread do Tk."""
+        box = {}
+
+        def worker():
+            try:
+                box["result"] = func()
+            except Exception as e:
+                box["error"] = e
+
+        th = threading.Thread(target=worker, daemon=True)
+        th.start()
+
+        def poll():
+            if th.is_alive():
+                self.after(100, poll)
+            else:
+                on_done(box.get("result"), box.get("error"))
+
+        self.after(100, poll)
+
+    def _auto_backup(self):
+        self.after(BACKUP_INTERVAL_MS, self._auto_backup)
+        if not self._backup_running and not self._maintenance_running and not self._closing:
+            self._start_backup("auto")
+
+    def _start_backup(self, kind, on_done=None):
+        self._backup_running = True
+
+        def done(metrics, error):
+            self._backup_running = False
+            if on_done:
+                on_done(metrics, error)
+
+        self._run_in_background(lambda: run_backup(kind), done)
+
+    def backup_now(self):
+        if self._backup_running:
+            messagebox.showinfo("Backup", "Já existe um backup em andamento.")
+            return
+
+        def done(m, error):
+            if error:
+                messagebox.showerror("Erro", f"Falha no backup:\n{error}")
+            elif m["integrity"] != "ok":
+                messagebox.showerror("Erro", f"Backup descartado: falhou no integrity_check ({m['integrity']}).")
+            else:
+                messagebox.showinfo(
+                    "Backup",
+                    f"Backup salvo em:\n{m['path']}\n\n"
+                    f"Tamanho: {m['size'] / 1024:.1f} KB | Duração: {m['duration']:.2f} s"
+                )
+
+        self._start_backup("manual", done)
+
+    def show_backups(self):
+        win = tk.Toplevel(self)
+        win.title("Backups")
+        win.geometry("820x420")
+        win.transient(self)
+
+        cols = [("file", "Arquivo", 300), ("kind", "Tipo", 90), ("size", "Tamanho (KB)", 110),
+                ("duration", "Duração (s)", 100), ("integrity", "Integridade", 120)]
+        tree = ttk.Treeview(win, columns=[c[0] for c in cols], show="headings", selectmode="browse")
+        for key, label, width in cols:
+            tree.heading(key, text=label)
+            tree.column(key, width=width, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 6))
+
+        def reload():
+            tree.delete(*tree.get_children())
+            log = read_backup_log()
+            for path in list_backups():
+                name = os.path.basename(path)
+                m = log.get(name, {})
+                tree.insert("", tk.END, iid=path, values=(
+                    name, m.get("tipo", ""), f"{os.path.getsize(path) / 1024:.1f}",
+                    m.get("duracao_s", ""), m.get("integridade", ""),
+                ))
+
+        def backup():
+            if self._backup_running:
+                return
+            self._start_backup("manual", lambda m, e: reload() if win.winfo_exists() else None)
+
+        def restore():
+            sel = tree.selection()
+            if not sel:
+                messagebox.showwarning("Atenção", "Selecione um backup para restaurar.", parent=win)
+                return
+            if self._backup_running:
+                messagebox.showinfo("Backup", "Aguarde o backup em andamento terminar.", parent=win)
+                return
+            path = sel[0]
+            if not messagebox.askyesno(
+                "Confirmar",
+                f"Restaurar {os.path.basename(path)}?\n"
+                "O estado atual será salvo antes em um backup 'pre-restore'.",
+                parent=win,
+            ):
+                return
+
+            def done(_safety, error):
+                self._backup_running = False
+                if error:
+                    messagebox.showerror("Erro", f"Falha ao restaurar:\n{error}", parent=win)
+                    return
+                self._ac_indexes.clear()
+                self._reset_change_tracking()
+                self.refresh_filter_options()
+                self.refresh_table()
+                self.clear_form()
+                reload()
+                messagebox.showinfo("Restaurado", "Backup restaurado com sucesso.", parent=win)
+
+            self._backup_running = True
+            self._run_in_background(lambda: restore_backup(path), done)
+
+        btns = ttk.Frame(win)
+        btns.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(btns, text="Fazer backup agora", command=backup).pack(side=tk.LEFT)
+        ttk.Button(btns, text="Restaurar selecionado", command=restore).pack(side=tk.LEFT, padx=6)
+        ttk.Button(btns, text="Atualizar lista", command=reload).pack(side=tk.LEFT, padx=6)
+        ttk.Button(btns, text="Fechar", command=win.destroy).pack(side=tk.RIGHT)
+
+        reload()
+
     def show_about(self):
         messagebox.showinfo(
             "Sobre",